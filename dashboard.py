@@ -20,15 +20,40 @@ class AgriculturalDashboard:
         Initialisation du tableau de bord avec le gestionnaire de données.
         """
         self.data_manager = data_manager
-        self.full_yield_source = None
-        self.full_ndvi_source = None
         self.yield_source = None
         self.ndvi_source = None
         self.stress_source = None
-        self.full_stress_source = None
         self.features = None
+        self._yield_tables = None
+        self._ndvi_tables = None
         self.create_data_sources()
 
+    @staticmethod
+    def _typed_source_data(df, value_cols):
+        """
+        Construit le dict de données d'une ColumnDataSource avec des
+        tableaux NumPy typés (valeurs en float32, dates en ms depuis epoch)
+        pour que Bokeh utilise son transport binaire au lieu du JSON.
+        """
+        data = {
+            'parcelle_id': df['parcelle_id'].astype(str).tolist(),
+            'date': df['date'].to_numpy().astype('datetime64[ms]').view('int64'),
+        }
+        for col in value_cols:
+            data[col] = df[col].to_numpy(np.float32)
+        return data
+
+    def _parcel_tables(self, df, value_cols):
+        """
+        Découpe un frame trié par parcelle en dict {parcelle: colonnes typées}
+        (structure de tableaux par parcelle) : le callback JS remplace
+        source.data d'un coup par la table de la parcelle choisie.
+        """
+        return {
+            str(pid): self._typed_source_data(group, value_cols)
+            for pid, group in df.groupby('parcelle_id', sort=False, observed=True)
+        }
+
     def create_data_sources(self):
         """
         Charge les données, prépare les sources de données pour Bokeh.
@@ -43,21 +68,35 @@ class AgriculturalDashboard:
             if missing_columns:
                 raise ValueError(f"Colonnes manquantes : {missing_columns}")
 
-            # Vérifiez si les données sont vides
-            yield_data = self.features[['parcelle_id', 'date', 'rendement_estime']].dropna()
-            ndvi_data = self.features[['parcelle_id', 'date', 'ndvi']].dropna()
+            # Un seul masque de lignes valides puis deux projections de
+            # colonnes, au lieu de deux copies dropna indépendantes du
+            # frame de caractéristiques.
+            cols = ['parcelle_id', 'date', 'rendement_estime', 'ndvi']
+            mask = self.features[cols].notna().all(axis=1)
+            sub = self.features.loc[mask, cols].sort_values(['parcelle_id', 'date'])
+
+            # Découpage SoA : une petite table de tableaux typés par
+            # parcelle, échangée atomiquement côté JS.
+            yield_data = sub[['parcelle_id', 'date', 'rendement_estime']]
+            ndvi_data = sub[['parcelle_id', 'date', 'ndvi']]
+            self._yield_tables = self._parcel_tables(yield_data, ['rendement_estime'])
+            self._ndvi_tables = self._parcel_tables(ndvi_data, ['ndvi'])
 
             if yield_data.empty:
                 logging.warning("Les données de rendement sont vides.")
                 self.yield_source = None
             else:
-                self.yield_source = ColumnDataSource(yield_data)
+                self.yield_source = ColumnDataSource(
+                    data=self._typed_source_data(yield_data, ['rendement_estime'])
+                )
 
             if ndvi_data.empty:
                 logging.warning("Les données NDVI sont vides.")
                 self.ndvi_source = None
             else:
-                self.ndvi_source = ColumnDataSource(ndvi_data)
+                self.ndvi_source = ColumnDataSource(
+                    data=self._typed_source_data(ndvi_data, ['ndvi'])
+                )
 
             logging.info("Sources de données préparées avec succès.")
 
@@ -102,28 +141,11 @@ class AgriculturalDashboard:
             callback_yield = CustomJS(
                 args={
                     "source": self.yield_source,
-                    "full_source": self.full_yield_source,
+                    "tables": self._yield_tables,
                     "select": select_widget
                 },
                 code="""
-                    const full = full_source.data;
-                    const filt = source.data;
-                    const choix = select.value;
-
-                    for (let k in filt) { filt[k] = []; }
-
-                    let indices = [];
-                    for (let i = 0; i < full['parcelle_id'].length; i++) {
-                        if (full['parcelle_id'][i] === choix) { indices.push(i); }
-                    }
-
-                    indices.sort((a,b) => new Date(full['date'][a]) - new Date(full['date'][b]));
-
-                    for (let key in filt) {
-                        for (let i of indices) {
-                            filt[key].push(full[key][i]);
-                        }
-                    }
+                    source.data = tables[select.value];
                     source.change.emit();
                 """
             )
@@ -165,22 +187,11 @@ class AgriculturalDashboard:
             callback_ndvi = CustomJS(
                 args={
                     "source": self.ndvi_source,
-                    "full_source": self.full_ndvi_source,
+                    "tables": self._ndvi_tables,
                     "select": select_widget
                 },
                 code="""
-                    const full = full_source.data;
-                    const filt = source.data;
-                    const choix = select.value;
-
-                    for (let k in filt) { filt[k] = []; }
-                    for (let i = 0; i < full['parcelle_id'].length; i++) {
-                        if (full['parcelle_id'][i] === choix) {
-                            for (let key in filt) {
-                                filt[key].push(full[key][i]);
-                            }
-                        }
-                    }
+                    source.data = tables[select.value];
                     source.change.emit();
                 """
             )
@@ -199,16 +210,51 @@ class AgriculturalDashboard:
                 logging.warning("Colonnes 'temperature' et 'stress_hydrique' manquantes.")
                 return None
 
-            self.features['temp_bin'] = (self.features['temperature'] // 5) * 5
-            self.features['stress_bin'] = (self.features['stress_hydrique'] // 0.1) * 0.1
-
-            matrix = (self.features.groupby(['parcelle_id', 'temp_bin', 'stress_bin'])
-                                    .size()
-                                    .reset_index(name='count'))
+            # Binning vectorisé : np.digitize sur les tableaux float bruts,
+            # puis indices de bins compactés dans un seul entier pour ne
+            # faire qu'un seul groupby au lieu d'un groupby à 3 clés sur
+            # des colonnes temporaires.
+            temp = self.features['temperature'].to_numpy()
+            stress = self.features['stress_hydrique'].to_numpy()
+
+            temp_edges = np.arange(np.floor(temp.min() / 5) * 5, temp.max() + 5, 5)
+            stress_edges = np.arange(np.floor(stress.min() / 0.1) * 0.1, stress.max() + 0.1, 0.1)
+
+            t_idx = np.digitize(temp, temp_edges) - 1
+            s_idx = np.digitize(stress, stress_edges) - 1
+            key = t_idx.astype(np.int32) * 256 + s_idx.astype(np.int32)
+
+            codes = self.features['parcelle_id'].cat.codes.to_numpy()
+            counts = pd.Series(key).groupby([codes, key]).size()
+
+            categories = self.features['parcelle_id'].cat.categories
+            code_lvl = counts.index.get_level_values(0)
+            key_lvl = counts.index.get_level_values(1).to_numpy()
+            matrix = pd.DataFrame({
+                'parcelle_id': categories.take(code_lvl).astype(str),
+                'temp_bin': temp_edges[key_lvl // 256],
+                'stress_bin': stress_edges[key_lvl % 256],
+                'count': counts.to_numpy(),
+            })
             matrix['norm_count'] = matrix['count'] / matrix['count'].max()
 
-            self.stress_source = ColumnDataSource(matrix)
-            self.full_stress_source = ColumnDataSource(matrix)
+            # Une petite table de tableaux typés par parcelle, échangée
+            # atomiquement dans le callback JS (même schéma que les sources
+            # rendement / NDVI).
+            stress_tables = {
+                str(pid): {
+                    'temp_bin': group['temp_bin'].to_numpy(np.float32),
+                    'stress_bin': group['stress_bin'].to_numpy(np.float32),
+                    'norm_count': group['norm_count'].to_numpy(np.float32),
+                }
+                for pid, group in matrix.groupby('parcelle_id', sort=False)
+            }
+
+            self.stress_source = ColumnDataSource(data={
+                'temp_bin': matrix['temp_bin'].to_numpy(np.float32),
+                'stress_bin': matrix['stress_bin'].to_numpy(np.float32),
+                'norm_count': matrix['norm_count'].to_numpy(np.float32),
+            })
 
             stress_plot = figure(
                 title="Matrice de Stress",
@@ -247,25 +293,11 @@ class AgriculturalDashboard:
             callback_stress = CustomJS(
                 args={
                     "source": self.stress_source,
-                    "full_source": self.full_stress_source,
+                    "tables": stress_tables,
                     "select": select_widget
                 },
                 code="""
-                    const data = full_source.data;
-                    const filt = source.data;
-                    const choix = select.value;
-
-                    filt["temp_bin"] = [];
-                    filt["stress_bin"] = [];
-                    filt["norm_count"] = [];
-
-                    for (let i = 0; i < data["parcelle_id"].length; i++) {
-                        if (data["parcelle_id"][i] === choix) {
-                            filt["temp_bin"].push(data["temp_bin"][i]);
-                            filt["stress_bin"].push(data["stress_bin"][i]);
-                            filt["norm_count"].push(data["norm_count"][i]);
-                        }
-                    }
+                    source.data = tables[select.value];
                     source.change.emit();
                 """
             )
@@ -320,26 +352,23 @@ class AgriculturalDashboard:
             callback_pred = CustomJS(
                 args={
                     "source": prediction_source,
-                    "full_source": self.full_yield_source,
+                    "tables": self._yield_tables,
                     "select": select_widget
                 },
                 code="""
-                    const full = full_source.data;
-                    const filt = source.data;
-                    const choix = select.value;
-
-                    filt["date"] = [];
-                    filt["actual_yield"] = [];
-                    filt["predicted_yield"] = [];
-
-                    for (let i = 0; i < full['parcelle_id'].length; i++) {
-                        if (full['parcelle_id'][i] === choix) {
-                            filt["date"].push(full["date"][i]);
-                            filt["actual_yield"].push(full["rendement_estime"][i]);
-                            const pred = full["rendement_estime"][i] * (1 + 0.05 * (Math.random() - 0.5));
-                            filt["predicted_yield"].push(pred);
-                        }
+                    const table = tables[select.value];
+                    const actual = table["rendement_estime"];
+                    const n = actual.length;
+                    const pred = new Array(n);
+                    for (let j = 0; j < n; j++) {
+                        pred[j] = actual[j] * (1 + 0.05 * (Math.random() - 0.5));
                     }
+
+                    source.data = {
+                        "date": table["date"],
+                        "actual_yield": actual,
+                        "predicted_yield": pred
+                    };
                     source.change.emit();
                 """
             )
@@ -357,7 +386,12 @@ class AgriculturalDashboard:
         try:
             if self.data_manager.monitoring_data is None:
                 raise ValueError("Données de monitoring non chargées.")
-            return sorted(self.data_manager.monitoring_data["parcelle_id"].unique())
+            parcelles = self.data_manager.monitoring_data["parcelle_id"]
+            if isinstance(parcelles.dtype, pd.CategoricalDtype):
+                # Les catégories sont déjà triées et mises en cache par la
+                # Categorical : pas de scan unique + tri à chaque rendu.
+                return list(parcelles.cat.categories)
+            return sorted(parcelles.unique())
         except Exception as err:
             logging.error(f"Erreur lors de la récupération des options de parcelle : {err}")
             return []
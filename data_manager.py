@@ -1,101 +1,370 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from sklearn.preprocessing import StandardScaler
+from pathlib import Path
+import numexpr as ne
+from numba import njit, prange
 import warnings
 import logging
 
+try:
+    import polars as pl
+    _HAS_POLARS = True
+except ImportError:
+    _HAS_POLARS = False
+
 
 warnings.filterwarnings('ignore')
 
+
+@njit(cache=True)
+def _decompose_kernel(x, period):
+    """Décomposition additive d'une série : tendance par moyenne mobile
+    centrée, saisonnalité par moyenne des écarts à la tendance, résidu.
+    Remplace statsmodels.seasonal_decompose pour une série mono-parcelle."""
+    n = x.size
+    half = period // 2
+    trend = np.full(n, np.nan)
+    if n >= period:
+        acc = 0.0
+        for i in range(period):
+            acc += x[i]
+        for start in range(n - period + 1):
+            trend[start + half] = acc / period
+            if start + period < n:
+                acc += x[start + period] - x[start]
+
+    detr = x - trend
+    seasonal = np.full(n, np.nan)
+    for p in range(period):
+        s = 0.0
+        count = 0
+        for j in range(p, n, period):
+            v = detr[j]
+            if not np.isnan(v):
+                s += v
+                count += 1
+        if count > 0:
+            m = s / count
+            for j in range(p, n, period):
+                seasonal[j] = m
+
+    resid = x - trend - seasonal
+    return trend, seasonal, resid
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _risk_kernel(stress, biomasse, out):
+    """Combinaison élémentaire du score de risque, fusionnée en une seule
+    boucle compilée (SIMD + parallèle) au lieu de l'arithmétique pandas."""
+    for i in prange(stress.size):
+        out[i] = stress[i] * 0.5 + biomasse[i] * 0.3
+
+# Répertoire contenant les fichiers de données (CSV sources et Parquet convertis)
+DATA_DIR = Path(__file__).resolve().parent
+
 class AgriculturalDataManager:
+    # Colonnes réellement utilisées par le tableau de bord et les analyses :
+    # seules celles-ci sont matérialisées depuis les fichiers Parquet.
+    MONITORING_COLS = ['date', 'parcelle_id', 'ndvi', 'lai', 'stress_hydrique', 'biomasse_estimee']
+    WEATHER_COLS = ['date', 'temperature', 'humidite', 'precipitation', 'rayonnement_solaire']
+    YIELD_COLS = ['date', 'parcelle_id', 'rendement_estime', 'rendement_final', 'progression']
+
+    # Colonnes numériques agrégées mensuellement (listes explicites plutôt
+    # que select_dtypes, pour que rien ne remonte silencieusement en float64)
+    MONITORING_NUM_COLS = ['ndvi', 'lai', 'stress_hydrique', 'biomasse_estimee']
+    WEATHER_NUM_COLS = ['temperature', 'humidite', 'precipitation', 'rayonnement_solaire']
+
+    # Les mesures agronomiques ont au plus 4 chiffres significatifs :
+    # float32 suffit et divise par deux la bande passante mémoire de
+    # toutes les passes numériques (agrégation, scaling, transport Bokeh).
+    CSV_DTYPES = {
+        'monitoring': {'ndvi': 'float32', 'lai': 'float32', 'stress_hydrique': 'float32',
+                       'biomasse_estimee': 'float32', 'latitude': 'float32', 'longitude': 'float32'},
+        'weather': {'temperature': 'float32', 'humidite': 'float32', 'precipitation': 'float32',
+                    'rayonnement_solaire': 'float32', 'vitesse_vent': 'float32',
+                    'direction_vent': 'float32'},
+        'soil': {'latitude': 'float32', 'longitude': 'float32', 'surface_ha': 'float32',
+                 'capacite_retention_eau': 'float32', 'ph': 'float32', 'matiere_organique': 'float32',
+                 'azote': 'float32', 'phosphore': 'float32', 'potassium': 'float32'},
+        'yield': {'rendement_estime': 'float32', 'rendement_final': 'float32',
+                  'progression': 'float32'},
+    }
+
+    # Fichiers sources CSV et leurs équivalents Parquet
+    CSV_FILES = {
+        'monitoring': 'monitoring_cultures.csv',
+        'weather': 'meteo_detaillee.csv',
+        'soil': 'sols.csv',
+        'yield': 'historique_rendements.csv',
+    }
+
     def __init__(self):
         """Initialise le gestionnaire de données agricoles"""
         self.monitoring_data = None
         self.weather_data = None
         self.soil_data = None
         self.yield_history = None
-        self.scaler = StandardScaler()
+        self.parcelle_dtype = None
+        self._sorted = False
+        self._monitoring_starts = None
+        self._monitoring_ends = None
+
+    def convert_to_parquet(self, keys=None):
+        """
+        Convertit les fichiers CSV sources (tous, ou la sélection `keys`)
+        en Parquet columnar : les dtypes sont stockés explicitement, ce qui
+        évite de repayer le parsing texte et l’inférence de types à chaque
+        démarrage. Le parsing passe par le tokenizer multi-thread de
+        pyarrow.csv et la table Arrow est écrite en Parquet sans détour
+        par pandas.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from pyarrow import csv as pacsv
+
+        has_date = {'monitoring': True, 'weather': True, 'soil': False, 'yield': True}
+        for key in (self.CSV_FILES if keys is None else keys):
+            csv_name = self.CSV_FILES[key]
+            csv_path = DATA_DIR / csv_name
+            parquet_path = csv_path.with_suffix('.parquet')
+
+            column_types = {col: pa.float32() for col in self.CSV_DTYPES[key]}
+            if has_date[key]:
+                column_types['date'] = pa.timestamp('ms')
+            if key != 'weather':
+                # L'encodage dictionnaire donne directement une Categorical
+                # côté pandas à la relecture.
+                column_types['parcelle_id'] = pa.dictionary(pa.int32(), pa.string())
+
+            table = pacsv.read_csv(
+                csv_path,
+                read_options=pacsv.ReadOptions(use_threads=True, block_size=16 << 20),
+                convert_options=pacsv.ConvertOptions(
+                    column_types=column_types,
+                    timestamp_parsers=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S'],
+                ),
+            )
+            pq.write_table(table, parquet_path,
+                           compression='snappy', row_group_size=131072)
+            logging.info(f"Converti {csv_name} -> {parquet_path.name}")
+
+    def _parquet_path(self, key):
+        """Retourne le chemin Parquet associé à un fichier source"""
+        return (DATA_DIR / self.CSV_FILES[key]).with_suffix('.parquet')
+
+    def _features_cache_path(self):
+        """Chemin du cache Parquet du résultat de prepare_features"""
+        return DATA_DIR / 'cache' / 'features.parquet'
+
+    def _sources_mtime(self):
+        """Date de modification la plus récente des fichiers CSV sources"""
+        return max((DATA_DIR / name).stat().st_mtime for name in self.CSV_FILES.values())
 
     def load_data(self):
         """
         Charge l’ensemble des données nécessaires au système
-        Effectue les conversions de types et les indexations temporelles
+        depuis les fichiers Parquet (convertis depuis les CSV au premier appel).
+        Seules les colonnes utiles sont matérialisées.
         """
-        self.monitoring_data = pd.read_csv('C:/Users/Zeen/projet_agricole2/data/monitoring_cultures.csv', parse_dates=['date'])
-        self.weather_data = pd.read_csv('C:/Users/Zeen/projet_agricole2/data/meteo_detaillee.csv', parse_dates=['date'])
-        self.soil_data = pd.read_csv('C:/Users/Zeen/projet_agricole2/data/sols.csv')
-        self.yield_history = pd.read_csv('C:/Users/Zeen/projet_agricole2/data/historique_rendements.csv', parse_dates=['date'])
+        # Reconvertit toute table dont le Parquet est manquant ou plus
+        # ancien que son CSV source : un CSV modifié doit invalider le
+        # Parquet, au même titre que le cache de prepare_features.
+        stale = [
+            key for key in self.CSV_FILES
+            if not self._parquet_path(key).exists()
+            or self._parquet_path(key).stat().st_mtime < (DATA_DIR / self.CSV_FILES[key]).stat().st_mtime
+        ]
+        if stale:
+            self.convert_to_parquet(stale)
+
+        import pyarrow.dataset as ds
+
+        # Le fichier de monitoring est le plus volumineux : lecture via
+        # pyarrow.dataset pour éviter le double-buffering Arrow -> pandas.
+        self.monitoring_data = (
+            ds.dataset(self._parquet_path('monitoring'))
+            .to_table(columns=self.MONITORING_COLS)
+            .to_pandas(self_destruct=True)
+        )
+        self.weather_data = pd.read_parquet(self._parquet_path('weather'), columns=self.WEATHER_COLS)
+        self.soil_data = pd.read_parquet(self._parquet_path('soil'))
+        self.yield_history = pd.read_parquet(self._parquet_path('yield'), columns=self.YIELD_COLS)
+
+        # parcelle_id intervient dans tous les groupby / merges : une
+        # Categorical partagée remplace les comparaisons de chaînes par
+        # des comparaisons de codes entiers.
+        ids = pd.Index(sorted(self.monitoring_data['parcelle_id'].unique()))
+        self.parcelle_dtype = pd.CategoricalDtype(categories=ids, ordered=False)
+        for df in (self.monitoring_data, self.soil_data, self.yield_history):
+            df['parcelle_id'] = df['parcelle_id'].astype(self.parcelle_dtype)
+
+        self._verify_temporal_consistency()
+
+        # Les lignes de monitoring sont contiguës par parcelle : bornes
+        # [start, end) précalculées pour que get_temporal_patterns fasse
+        # une tranche iloc (une vue) au lieu d'un masque booléen O(N).
+        codes = self.monitoring_data['parcelle_id'].cat.codes.to_numpy()
+        if (np.diff(codes) >= 0).all():
+            grid = np.arange(len(self.parcelle_dtype.categories))
+            self._monitoring_starts = np.searchsorted(codes, grid, side='left')
+            self._monitoring_ends = np.searchsorted(codes, grid, side='right')
 
     def _setup_temporal_indices(self):
         """
-        Configure les index temporels pour les différentes séries
-        de données et vérifie leur cohérence
+        Configure les index temporels des séries agrégées par mois.
+        yield_history conserve sa colonne date : il est fusionné par clé.
         """
         self.monitoring_data.set_index('date', inplace=True)
         self.weather_data.set_index('date', inplace=True)
-        self.yield_history.set_index('date', inplace=True)
 
     def _verify_temporal_consistency(self):
         """
-        Vérifie la cohérence des périodes temporelles entre
-        les différents jeux de données
+        Vérifie la cohérence des périodes temporelles entre les différents
+        jeux de données : une passe NumPy sans branche sur les int64
+        sous-jacents (dates croissantes par parcelle pour le monitoring et
+        les rendements, globalement pour la météo), court-circuitée une
+        fois validée.
         """
-        if not self.monitoring_data.index.is_monotonic:
-            raise ValueError("Les données de monitoring ne sont pas triées par date.")
-        if not self.weather_data.index.is_monotonic:
+        if self._sorted:
+            return
+
+        def dates_i8(df):
+            if isinstance(df.index, pd.DatetimeIndex):
+                return df.index.asi8
+            return df['date'].to_numpy().view('int64')
+
+        if not (np.diff(dates_i8(self.weather_data)) >= 0).all():
             raise ValueError("Les données météorologiques ne sont pas triées par date.")
-        if not self.yield_history.index.is_monotonic:
-            raise ValueError("Les données historiques de rendements ne sont pas triées par date.")
 
-    def prepare_features(self):
+        for name, df in (('de monitoring', self.monitoring_data),
+                         ('historiques de rendements', self.yield_history)):
+            dates = dates_i8(df)
+            codes = df['parcelle_id'].cat.codes.to_numpy()
+            if not ((np.diff(dates) >= 0) | (np.diff(codes) != 0)).all():
+                raise ValueError(f"Les données {name} ne sont pas triées par date.")
+
+        self._sorted = True
+
+    def _prepare_features_polars(self):
         """
-        Prépare les caractéristiques pour l’analyse en fusionnant
-        les différentes sources de données.
+        Pipeline de fusion exécuté en lazy par Polars : scan des Parquet,
+        agrégation mensuelle et jointures fusionnées en un seul plan
+        multi-thread, une seule matérialisation au collect() final.
         """
-        try:
-            # Vérification et conversion des dates
-            self.monitoring_data['date'] = pd.to_datetime(self.monitoring_data['date'])
-            self.weather_data['date'] = pd.to_datetime(self.weather_data['date'])
-            self.yield_history['date'] = pd.to_datetime(self.yield_history['date'])
-
-            self.monitoring_data.set_index('date', inplace=True)
-            self.weather_data.set_index('date', inplace=True)
-
-            # Agrégation des données
-            numeric_cols_monitoring = self.monitoring_data.select_dtypes(include=[np.number]).columns
-            monitoring_monthly = self.monitoring_data[numeric_cols_monitoring.tolist() + ['parcelle_id']].groupby(
-                [pd.Grouper(freq='M'), 'parcelle_id']
-            ).mean().reset_index()
-
-            numeric_cols_weather = self.weather_data.select_dtypes(include=[np.number]).columns
-            weather_monthly = self.weather_data[numeric_cols_weather].groupby(
-                pd.Grouper(freq='M')
-            ).mean().reset_index()
-
-            # Fusions successives
-            combined_data = pd.merge_asof(
-                monitoring_monthly.sort_values('date'),
-                weather_monthly.sort_values('date'),
-                on='date'
-            )
+        # Fin de mois à minuit, comme les labels resample('ME') de pandas
+        month_end = pl.col('date').dt.truncate('1mo').dt.month_end()
+
+        monitoring_monthly = (
+            pl.scan_parquet(self._parquet_path('monitoring'))
+            .select(self.MONITORING_COLS)
+            .with_columns(month_end, pl.col('parcelle_id').cast(pl.Utf8))
+            .group_by(['date', 'parcelle_id'])
+            .agg([pl.col(c).mean() for c in self.MONITORING_NUM_COLS])
+        )
+        weather_monthly = (
+            pl.scan_parquet(self._parquet_path('weather'))
+            .select(self.WEATHER_COLS)
+            .with_columns(month_end)
+            .group_by('date')
+            .agg([pl.col(c).mean() for c in self.WEATHER_NUM_COLS])
+        )
+        soil = (
+            pl.scan_parquet(self._parquet_path('soil'))
+            .with_columns(pl.col('parcelle_id').cast(pl.Utf8))
+        )
+        yield_monthly = (
+            pl.scan_parquet(self._parquet_path('yield'))
+            .select(['date', 'parcelle_id', 'rendement_estime'])
+            .with_columns(month_end, pl.col('parcelle_id').cast(pl.Utf8))
+        )
+
+        combined = (
+            monitoring_monthly
+            .join(weather_monthly, on='date')
+            .join(soil, on='parcelle_id', how='left')
+            .join(yield_monthly, on=['date', 'parcelle_id'], how='left')
+            .sort(['date', 'parcelle_id'])
+        )
+        combined_data = combined.collect().to_pandas()
+        combined_data['parcelle_id'] = combined_data['parcelle_id'].astype(self.parcelle_dtype)
+        return combined_data
+
+    def _prepare_features_pandas(self):
+        """
+        Pipeline de fusion pandas, utilisé quand Polars n'est pas disponible.
+        """
+        # Les dates sortent de Parquet déjà en datetime64 : pas de
+        # reconversion, on pose seulement les index temporels si ce
+        # n'est pas déjà fait.
+        if not isinstance(self.monitoring_data.index, pd.DatetimeIndex):
+            self._setup_temporal_indices()
+
+        # Agrégation des données : resample mensuel (chemin Cython
+        # spécialisé) plutôt que le Grouper générique + reset_index.
+        monitoring_monthly = (
+            self.monitoring_data[self.MONITORING_NUM_COLS]
+            .groupby(self.monitoring_data['parcelle_id'], observed=True)
+            .resample('ME')
+            .mean()
+            .reset_index()
+        )
+
+        weather_monthly = self.weather_data[self.WEATHER_NUM_COLS].resample('ME').mean().reset_index()
+
+        # Les deux côtés sont déjà agrégés au mois : la clé de jointure
+        # est déterministe. Des merges directs sur des codes de période
+        # int64 remplacent les merge_asof (pas de tri O(N log N),
+        # jointures par hachage sur entiers).
+        monitoring_monthly['period'] = monitoring_monthly['date'].dt.to_period('M').astype('int64')
+        weather_monthly['period'] = weather_monthly['date'].dt.to_period('M').astype('int64')
+
+        combined_data = pd.merge(
+            monitoring_monthly,
+            weather_monthly.drop(columns='date'),
+            on='period'
+        )
+        combined_data = pd.merge(
+            combined_data,
+            self.soil_data,
+            how='left',
+            on='parcelle_id'
+        )
+
+        # Fusion avec yield_history (déjà mensuel, dates en fin de mois)
+        if 'rendement_estime' in self.yield_history.columns:
+            yield_monthly = self.yield_history[['date', 'parcelle_id', 'rendement_estime']].copy()
+            yield_monthly['period'] = yield_monthly['date'].dt.to_period('M').astype('int64')
             combined_data = pd.merge(
                 combined_data,
-                self.soil_data,
+                yield_monthly.drop(columns='date'),
                 how='left',
-                on='parcelle_id'
+                on=['period', 'parcelle_id']
             )
+        else:
+            raise KeyError("'rendement_estime' n'est pas présent dans yield_history")
 
-            # Fusion avec yield_history
-            if 'rendement_estime' in self.yield_history.columns:
-                combined_data = pd.merge_asof(
-                    combined_data.sort_values('date'),
-                    self.yield_history[['date', 'parcelle_id', 'rendement_estime']].sort_values('date'),
-                    on='date',
-                    by='parcelle_id'
-                )
+        combined_data.drop(columns='period', inplace=True)
+        return combined_data
+
+    def prepare_features(self):
+        """
+        Prépare les caractéristiques pour l’analyse en fusionnant
+        les différentes sources de données.
+        """
+        try:
+            # Le pipeline est déterministe : si aucun CSV source n'a changé
+            # depuis la dernière exécution, on recharge directement le
+            # résultat mis en cache au lieu de refaire groupby + fusions.
+            cache_path = self._features_cache_path()
+            if cache_path.exists() and cache_path.stat().st_mtime >= self._sources_mtime():
+                logging.info("Caractéristiques rechargées depuis le cache Parquet")
+                return pd.read_parquet(cache_path)
+
+            if _HAS_POLARS:
+                combined_data = self._prepare_features_polars()
             else:
-                raise KeyError("'rendement_estime' n'est pas présent dans yield_history")
+                combined_data = self._prepare_features_pandas()
 
             # Vérifiez si les colonnes nécessaires existent
             if 'rendement_estime' not in combined_data.columns:
@@ -103,9 +372,30 @@ class AgriculturalDataManager:
 
             combined_data.dropna(inplace=True)
 
-            # Mise à l'échelle des données numériques
+            # Mise à l'échelle des données numériques : standardisation
+            # (x - moyenne) / écart-type calculée en place avec NumExpr,
+            # sans passer par la validation et la copie float64 de sklearn.
             numeric_cols = combined_data.select_dtypes(include=[np.number]).columns
-            combined_data[numeric_cols] = self.scaler.fit_transform(combined_data[numeric_cols])
+            # copy=True : sous copy-on-write, to_numpy peut renvoyer une
+            # vue en lecture seule, or NumExpr écrit le résultat en place.
+            arr = combined_data[numeric_cols].to_numpy(dtype=np.float32, copy=True)
+            m = arr.mean(axis=0)
+            s = arr.std(axis=0)
+            s[s == 0] = 1
+            ne.evaluate('(arr - m) / s', out=arr)
+
+            # Réaffectation en un seul bloc : le frame final est reconstruit
+            # autour du bloc float32 déjà mis à l'échelle, au lieu d'un
+            # __setitem__ par colonne (qui copie chaque colonne séparément).
+            col_order = combined_data.columns
+            scaled = pd.DataFrame(arr, index=combined_data.index, columns=numeric_cols)
+            other_cols = col_order.difference(numeric_cols, sort=False)
+            combined_data = pd.concat(
+                [combined_data[other_cols], scaled], axis=1
+            )[col_order]
+
+            cache_path.parent.mkdir(exist_ok=True)
+            combined_data.to_parquet(cache_path, compression='zstd')
 
             logging.info(f"Colonnes disponibles après fusion : {combined_data.columns}")
             return combined_data
@@ -130,16 +420,33 @@ class AgriculturalDataManager:
         )
         return enriched_data
 
+    def _monitoring_slice(self, parcelle_id):
+        """
+        Retourne les lignes de monitoring d'une parcelle : tranche iloc
+        précalculée (une vue, pas de copie) quand les lignes sont contiguës,
+        masque booléen sinon.
+        """
+        if self._monitoring_starts is not None:
+            i = self.parcelle_dtype.categories.get_loc(parcelle_id)
+            return self.monitoring_data.iloc[self._monitoring_starts[i]:self._monitoring_ends[i]]
+        return self.monitoring_data[self.monitoring_data['parcelle_id'] == parcelle_id]
+
     def get_temporal_patterns(self, parcelle_id):
         """
         Analyse les patterns temporels pour une parcelle donnée
         """
-        parcelle_data = self.monitoring_data[self.monitoring_data['parcelle_id'] == parcelle_id]
+        parcelle_data = self._monitoring_slice(parcelle_id)
         
+        # La fusion se fait sur la colonne 'date' : on ne ramène l'index
+        # temporel en colonne que s'il a été posé (chemin pandas), pour ne
+        # pas matérialiser une colonne 'index' parasite sinon.
+        if isinstance(parcelle_data.index, pd.DatetimeIndex):
+            parcelle_data = parcelle_data.reset_index()
+
         # Fusionner avec yield_history pour inclure 'rendement_estime'
         if 'rendement_estime' in self.yield_history.columns:
             parcelle_data = pd.merge(
-                parcelle_data.reset_index(),  # Reset index to allow merging on 'date'
+                parcelle_data,
                 self.yield_history[['date', 'parcelle_id', 'rendement_estime']],
                 how='left',
                 on=['date', 'parcelle_id']
@@ -155,26 +462,33 @@ class AgriculturalDataManager:
         actuelles et l’historique
         """
         # Exemple de calcul d’un score de risque fictif
-        data['risk_score'] = data['stress_hydrique'] * 0.5 + data['biomasse_estimee'] * 0.3
+        sh = data['stress_hydrique'].to_numpy(np.float32)
+        bm = data['biomasse_estimee'].to_numpy(np.float32)
+        out = np.empty_like(sh)
+        _risk_kernel(sh, bm, out)
+        data['risk_score'] = out
         return data[['parcelle_id', 'date', 'risk_score']]
-    def analyze_yield_patterns(self, parcelle_id):
+    def analyze_yield_patterns(self, parcelle_id, period=12):
             """
             Réalise une analyse approfondie des patterns de rendement
+            (décomposition additive tendance / saisonnalité / résidu
+            via le noyau compilé _decompose_kernel)
             """
-            from statsmodels.tsa.seasonal import seasonal_decompose
-
             # Extraction et préparation des données
             history = self.yield_history[
                 self.yield_history['parcelle_id'] == parcelle_id
-            ].copy()
+            ]
 
             # Décomposition saisonnière des rendements estimés
             if 'rendement_estime' in history.columns:
-                decomposition = seasonal_decompose(history.set_index('date')['rendement_estime'], model='additive', period=12)
+                serie = history.set_index('date')['rendement_estime']
+                trend, seasonal, resid = _decompose_kernel(
+                    serie.to_numpy(np.float64), period
+                )
                 result = {
-                    'trend': decomposition.trend,
-                    'seasonal': decomposition.seasonal,
-                    'residual': decomposition.resid
+                    'trend': pd.Series(trend, index=serie.index, name='trend'),
+                    'seasonal': pd.Series(seasonal, index=serie.index, name='seasonal'),
+                    'residual': pd.Series(resid, index=serie.index, name='resid')
                 }
                 return result
             else: